@@ -1,7 +1,15 @@
+import functools
+import hashlib
 import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from io import BytesIO
+from typing import TYPE_CHECKING
 import streamlit as st
-import pandas as pd
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 # ---------- Controls (regex rules) ----------
 CONTROLS = {
@@ -28,90 +36,309 @@ FAIL_PATTERNS = {
     "iam_least_privilege": [r"action.*\*.*resource.*\*"],  # overly-broad IAM
 }
 
+# Flat rule table (Hyperscan / Aho-Corasick / pyarrow paths): the rule id is the index into this list.
+_RULES = [(ctrl, p) for ctrl, pats in CONTROLS.items() for p in pats] + \
+            [(ctrl, p) for ctrl, pats in FAIL_PATTERNS.items() for p in pats]
+
+def _is_literal(p: str) -> bool:
+    return re.escape(p).replace("\\ ", " ") == p
+
+def _build_literal_automaton():
+    """Aho-Corasick automaton over the plain-phrase rules. If pyahocorasick is not available, return None."""
+    try:
+        import ahocorasick
+        by_phrase = {}
+        for rule in _RULES:
+            if _is_literal(rule[1]):
+                by_phrase.setdefault(rule[1], []).append(rule)
+        automaton = ahocorasick.Automaton()
+        for phrase, rules in by_phrase.items():
+            automaton.add_word(phrase, tuple(rules))
+        automaton.make_automaton()
+        return automaton
+    except Exception:
+        return None
+
+@functools.cache
+def _fallback_matchers() -> tuple:
+    """Matchers for when Hyperscan is unavailable, built on first use (never, where Hyperscan loads).
+
+    Returns ``(automaton, regexes)``: the Aho-Corasick automaton over the plain phrases (None if
+    pyahocorasick is missing) and a ``(ctrl, compiled)`` pair for every
+    rule the automaton does not cover.
+    """
+    automaton = _build_literal_automaton()
+    regexes = [(ctrl, re.compile(p)) for ctrl, p in _RULES if automaton is None or not _is_literal(p)]
+    return automaton, regexes
+
+def _build_hyperscan_db():
+    """Compile every rule into one Hyperscan database. If Hyperscan is not available, return None."""
+    try:
+        import hyperscan
+        db = hyperscan.Database()
+        db.compile(
+            expressions=[p.encode() for _, p in _RULES],
+            ids=list(range(len(_RULES))),
+            elements=len(_RULES),
+            flags=[hyperscan.HS_FLAG_SINGLEMATCH] * len(_RULES),
+        )
+        return db
+    except Exception:
+        return None
+
+_HS_DB = _build_hyperscan_db()
+# A Hyperscan scratch can't serve two scans at once, and Streamlit runs each session's script on
+# its own thread, so every thread gets its own scratch.
+_hs_local = threading.local()
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg")
+EVAL_CACHE_SIZE = 256  # evaluate() results kept per process
+VECTORIZE_MIN_BATCH = 16  # uncached files; below this (or with Hyperscan), per-file evaluate() is cheaper
+MAX_PDF_PAGES = 500  # bound per-file parse time on very large PDFs
+
+# ---------- Lazy imports ----------
+# Heavy modules load on first use, so a cold start (or a text-only session) never pays for them.
+@functools.cache
+def _pandas():
+    import pandas
+    return pandas
+
+@functools.cache
+def _pdf_reader_cls():
+    from pypdf import PdfReader
+    return PdfReader
+
 # ---------- Helpers ----------
 def normalize(text: str) -> str:
-    return re.sub(r"\s+", " ", text or "").lower()
+    # str.split() already splits on runs of any whitespace; no regex pass needed
+    return " ".join((text or "").lower().split())
 
 @st.cache_resource
 def get_easyocr_reader():
     """Create once-per-session. If EasyOCR/torch not available, return None."""
     try:
         import easyocr
-        return easyocr.Reader(["en"], verbose=False)
+        import torch
+        return easyocr.Reader(["en"], gpu=torch.cuda.is_available(), verbose=False)
     except Exception:
         return None
 
-def extract_text(file) -> str:
-    """Route by extension and extract text (OCR for images, PyPDF2 for PDFs, plain decode for others)."""
-    name = (file.name or "").lower()
+def extract_text(name: str, data: bytes, reader=None) -> tuple:
+    """Route by extension and extract text (OCR for images, pypdf for PDFs, plain decode for others).
 
-    # Read raw bytes once
-    data = file.read()
-    file.seek(0)
+    Runs on worker threads, so it must not touch ``st``: returns ``(text, warning)`` and the
+    caller renders the warning, if any.
+    """
+    lname = (name or "").lower()
 
     # Images → EasyOCR (if available)
-    if name.endswith((".png", ".jpg", ".jpeg")):
-        reader = get_easyocr_reader()
+    if lname.endswith(IMAGE_EXTS):
         if reader is None:
-            st.warning("EasyOCR unavailable. Install `easyocr torch torchvision` in requirements.txt to OCR images.")
-            return ""
-        # EasyOCR expects a filepath; write a small temp file
-        import tempfile, os
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmp:
-            tmp.write(data)
-            tmp.flush()
-            path = tmp.name
-        try:
-            out = reader.readtext(path, detail=0)
-            return " ".join(out)
-        finally:
-            try: os.remove(path)
-            except Exception: pass
-
-    # PDFs → PyPDF2
-    if name.endswith(".pdf"):
+            return "", "EasyOCR unavailable. Install `easyocr torch torchvision` in requirements.txt to OCR images."
+        # Decode in memory (cv2/numpy ship with EasyOCR); no temp-file round trip
+        import cv2
+        import numpy as np
+        img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            return "", f"Could not decode image: {name}"
+        return " ".join(reader.readtext(img, detail=0)), None
+
+    # PDFs → pypdf
+    if lname.endswith(".pdf"):
         try:
-            from PyPDF2 import PdfReader
-            import io
-            reader = PdfReader(io.BytesIO(data))
-            parts = [(p.extract_text() or "") for p in reader.pages]
-            return "\n".join(parts)
+            pdf = _pdf_reader_cls()(BytesIO(data))
+            n_pages = len(pdf.pages)
+            parts = [(p.extract_text() or "") for p in pdf.pages[:MAX_PDF_PAGES]]
+            warning = None
+            if n_pages > MAX_PDF_PAGES:
+                warning = f"{name}: only the first {MAX_PDF_PAGES} of {n_pages} pages were checked."
+            return "\n".join(parts), warning
         except Exception:
-            st.warning("PyPDF2 not available or failed to read this PDF.")
-            return ""
+            return "", "pypdf not available or failed to read this PDF."
 
     # Plain text (txt/log/json/csv…)
     try:
-        return data.decode("utf-8", errors="ignore")
+        return data.decode("utf-8", errors="ignore"), None
     except Exception:
-        return ""
+        return "", None
 
-def evaluate(text: str) -> dict:
-    t = normalize(text)
+def _hs_matches(t: bytes) -> set:
+    """Single Hyperscan pass over ``t``; returns the matched (control, pattern) pairs."""
+    import hyperscan
+    scratch = getattr(_hs_local, "scratch", None)
+    if scratch is None:
+        scratch = _hs_local.scratch = hyperscan.Scratch(_HS_DB)
+    ids = set()
+    _HS_DB.scan(t, match_event_handler=lambda rule_id, *_: ids.add(rule_id), scratch=scratch)
+    return {_RULES[i] for i in ids}
+
+def _fallback_matches(s: str) -> set:
+    """Matched (control, pattern) pairs without Hyperscan: plain phrases in one Aho-Corasick pass over
+    the normalized text ``s``, regex rules searched one by one."""
+    automaton, regexes = _fallback_matchers()
+    matched = set()
+    if automaton is not None:
+        for _, rules in automaton.iter(s):
+            matched.update(rules)
+    matched.update((ctrl, p.pattern) for ctrl, p in regexes if p.search(s))
+    return matched
+
+def _results_from_matches(matched: set) -> dict:
+    """Build the per-control outcome dict from a set of matched (control, pattern) pairs."""
     out = {}
     for ctrl, pats in CONTROLS.items():
-        hits = [p for p in pats if re.search(p, t)]
-        fails = [p for p in FAIL_PATTERNS.get(ctrl, []) if re.search(p, t)]
+        hits = tuple(p for p in pats if (ctrl, p) in matched)
+        fails = tuple(p for p in FAIL_PATTERNS.get(ctrl, ()) if (ctrl, p) in matched)
         status = "NON_COMPLIANT" if fails else ("COMPLIANT" if hits else "INSUFFICIENT_EVIDENCE")
+        # Immutable, rule-ordered tuple: safe to share from the evaluate() cache and hashable for joins
         out[ctrl] = {"status": status, "matches": hits + fails}
     return out
 
-def results_to_dataframe(results_by_file: dict) -> pd.DataFrame:
-    rows = []
+# LRU of evaluate() results keyed by a 16-byte blake2b digest of the text only, so neither the
+# texts are kept alive nor compared on a hit. Script threads of concurrent sessions share it.
+_eval_cache = OrderedDict()
+_eval_lock = threading.Lock()
+
+def _text_digest(text: str) -> bytes:
+    return hashlib.blake2b((text or "").encode(), digest_size=16).digest()
+
+def _cache_get(h: bytes):
+    with _eval_lock:
+        res = _eval_cache.get(h)
+        if res is not None:
+            _eval_cache.move_to_end(h)
+        return res
+
+def _cache_put(h: bytes, res: dict) -> None:
+    with _eval_lock:
+        _eval_cache[h] = res
+        _eval_cache.move_to_end(h)
+        while len(_eval_cache) > EVAL_CACHE_SIZE:
+            _eval_cache.popitem(last=False)
+
+def evaluate(text: str) -> dict:
+    """Check ``text`` against every control. Memoized per process; treat the result as read-only."""
+    h = _text_digest(text)
+    res = _cache_get(h)
+    if res is None:
+        res = _evaluate_uncached(text)
+        _cache_put(h, res)
+    return res
+
+def _evaluate_uncached(text: str) -> dict:
+    s = normalize(text)
+    if _HS_DB is not None:
+        return _results_from_matches(_hs_matches(s.encode()))  # Hyperscan scans bytes
+    return _results_from_matches(_fallback_matches(s))
+
+def _arrow_matches(normalized: list):
+    """Matched (control, pattern) sets per text, one pyarrow regex call per rule. None without pyarrow."""
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except Exception:
+        return None
+
+    arr = pa.array(normalized, type=pa.string())
+    matched = [set() for _ in normalized]
+    for rule in _RULES:
+        try:
+            mask = pc.match_substring_regex(arr, rule[1]).to_pylist()
+        except pa.ArrowInvalid:  # pattern outside RE2's syntax: fall back to Python re
+            rx = re.compile(rule[1])
+            mask = [rx.search(t) is not None for t in normalized]
+        for i, hit in enumerate(mask):
+            if hit:
+                matched[i].add(rule)
+    return matched
+
+def evaluate_batch(texts: list) -> list:
+    """evaluate() over many texts, sharing its memo.
+
+    Without Hyperscan, a large batch of uncached texts is matched with pyarrow, one call per rule
+    across all texts; Hyperscan's single pass per text is faster than that, so it is used as-is.
+    """
+    digests = [_text_digest(t) for t in texts]
+    results = [_cache_get(h) for h in digests]
+    todo = [i for i, res in enumerate(results) if res is None]
+    matched = None
+    if _HS_DB is None and len(todo) >= VECTORIZE_MIN_BATCH:
+        matched = _arrow_matches([normalize(texts[i]) for i in todo])
+    for n, i in enumerate(todo):
+        res = _results_from_matches(matched[n]) if matched is not None else _evaluate_uncached(texts[i])
+        _cache_put(digests[i], res)
+        results[i] = res
+    return results
+
+@st.cache_data(show_spinner=False, max_entries=512)
+def _extract_cached(key: bytes, name: str, _data: bytes, _reader=None) -> tuple:
+    """extract_text memoized on the content hash + name; the raw bytes and reader are not hashed."""
+    return extract_text(name, _data, _reader)
+
+STATUSES = ["COMPLIANT", "NON_COMPLIANT", "INSUFFICIENT_EVIDENCE"]
+
+def results_to_dataframe(results_by_file: dict) -> "pd.DataFrame":
+    pd = _pandas()
+    # Columnar build: one list per column, so pandas skips per-row dict inference
+    cols = ["file"] + [f"{c}_{k}" for c in CONTROLS for k in ("status", "matches")]
+    data = {c: [] for c in cols}
+    joined = {}  # matches tuple -> "; "-joined cell; identical cells share one str object
     for fname, res in results_by_file.items():
-        row = {"file": fname}
+        data["file"].append(fname)
         for ctrl, outcome in res.items():
-            row[f"{ctrl}_status"]  = outcome["status"]
-            row[f"{ctrl}_matches"] = "; ".join(outcome["matches"])
-        rows.append(row)
-    return pd.DataFrame(rows)
+            m = outcome["matches"]
+            cell = joined.get(m)
+            if cell is None:
+                cell = joined[m] = "; ".join(m)
+            data[f"{ctrl}_status"].append(outcome["status"])
+            data[f"{ctrl}_matches"].append(cell)
+    df = pd.DataFrame(data, columns=cols)
+    for ctrl in CONTROLS:
+        df[f"{ctrl}_status"] = pd.Categorical(df[f"{ctrl}_status"], categories=STATUSES)
+    return df
+
+def results_to_xlsx(df: "pd.DataFrame") -> bytes:
+    """Stream ``df`` into an .xlsx workbook with xlsxwriter's constant_memory mode.
+
+    constant_memory flushes each row as soon as the next one starts, so cells must be
+    written in row order; pandas' to_excel writes column by column and would lose data.
+    """
+    import xlsxwriter
+    buf = BytesIO()
+    wb = xlsxwriter.Workbook(buf, {"constant_memory": True})
+    ws = wb.add_worksheet("results")
+    bold = wb.add_format({"bold": True})
+    for c, col in enumerate(df.columns):
+        ws.write_string(0, c, col, bold)
+    for r, row in enumerate(df.itertuples(index=False, name=None), start=1):
+        for c, val in enumerate(row):
+            ws.write_string(r, c, str(val))
+    wb.close()
+    return buf.getvalue()
+
+EXPORT_MIME = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+LARGE_BATCH = 1000  # rows; above this, default the download to Parquet
+
+def export_results(df: "pd.DataFrame", fmt: str) -> bytes:
+    """Serialize results for download; CSV/Parquet avoid XLSX's XML overhead on big batches."""
+    if fmt == "csv":
+        return df.to_csv(index=False).encode("utf-8")
+    if fmt == "parquet":
+        buf = BytesIO()
+        df.to_parquet(buf, engine="pyarrow", compression="zstd", index=False)
+        return buf.getvalue()
+    return results_to_xlsx(df)
 
 # ---------- UI ----------
 st.set_page_config(page_title="Security Control Checker", page_icon="🔎", layout="centered")
 st.title("🔎 Security Control Checker")
 st.write(
     "Upload **images/PDFs/TXT/JSON/LOG/CSV** → we extract text (OCR for images, PDF parser for PDFs), "
-    "match against rules, and let you **download an Excel** of results."
+    "match against rules, and let you **download the results** (Excel, CSV or Parquet)."
 )
 
 uploads = st.file_uploader(
@@ -124,22 +351,38 @@ uploads = st.file_uploader(
 show_preview = st.checkbox("Show extracted text preview (first 1000 chars)", value=False)
 
 if uploads:
-    results = {}
-    for uf in uploads:
-        with st.spinner(f"Processing: {uf.name}"):
-            text = extract_text(uf)
+    items = [(uf.name, uf.getvalue()) for uf in uploads]  # backing buffer; cursor untouched
+    # Build the shared OCR reader up front so workers never race to construct it
+    reader = get_easyocr_reader() if any(n.lower().endswith(IMAGE_EXTS) for n, _ in items) else None
 
-        if not text.strip():
-            st.warning(f"No text extracted from: {uf.name}")
-            continue
+    texts = {}
+    with st.spinner(f"Processing {len(items)} file(s)…"), \
+            ThreadPoolExecutor(max_workers=min(8, len(items))) as ex:
+        futs = {
+            ex.submit(_extract_cached, hashlib.blake2b(b, digest_size=16).digest(), n, b, reader): n
+            for n, b in items
+        }
+        for fut in as_completed(futs):
+            name = futs[fut]
+            text, warning = fut.result()
+            if warning:
+                st.warning(warning)
 
-        if show_preview:
-            st.text_area(f"Extracted text preview — {uf.name}", text[:1000], height=180)
+            if not text.strip():
+                st.warning(f"No text extracted from: {name}")
+                continue
 
-        res = evaluate(text)
-        results[uf.name] = res
+            if show_preview:
+                st.text_area(f"Extracted text preview — {name}", text[:1000], height=180)
+            texts[name] = text
 
+    # Evaluate the whole batch at once; rows follow upload order regardless of completion order
+    names = [n for n in dict.fromkeys(n for n, _ in items) if n in texts]
+    results = dict(zip(names, evaluate_batch([texts[n] for n in names])))
+
+    for name, res in results.items():
         # Per-file status summary
+        st.markdown(f"**{name}**")
         cols = st.columns(3)
         compliant = sum(1 for r in res.values() if r["status"] == "COMPLIANT")
         noncomp  = sum(1 for r in res.values() if r["status"] == "NON_COMPLIANT")
@@ -153,15 +396,17 @@ if uploads:
         st.subheader("📊 Results")
         st.dataframe(df, use_container_width=True)
 
-        # Excel download
-        buf = BytesIO()
-        with pd.ExcelWriter(buf, engine="openpyxl") as writer:
-            df.to_excel(writer, index=False, sheet_name="results")
+        # Download (Excel for small sets; CSV/Parquet are much cheaper for large batches)
+        formats = list(EXPORT_MIME)
+        fmt = st.radio(
+            "Format", formats, index=formats.index("parquet" if len(df) >= LARGE_BATCH else "xlsx"),
+            horizontal=True,
+        )
         st.download_button(
-            "⬇️ Download results.xlsx",
-            data=buf.getvalue(),
-            file_name="results.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            f"⬇️ Download results.{fmt}",
+            data=export_results(df, fmt),
+            file_name=f"results.{fmt}",
+            mime=EXPORT_MIME[fmt],
         )
 
-st.caption("Tip: On Streamlit Cloud, include `easyocr`, `torch`, `torchvision`, `PyPDF2`, `pandas`, and `openpyxl` in requirements.txt.")
+st.caption("Tip: On Streamlit Cloud, include `easyocr`, `torch`, `torchvision`, `pypdf`, `pandas`, `xlsxwriter`, and `pyarrow` in requirements.txt.")
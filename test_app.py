@@ -0,0 +1,111 @@
+"""Every matching backend must produce the same statuses and matches column as plain ``re.search``."""
+import random
+import re
+
+import pytest
+
+import app
+
+PHRASES = [
+    "Certificate of Data Destruction", "permanently destroyed", "secure data wiping",
+    "0.0.0.0/0 allow tcp:22", "tcp 3389 from 0.0.0.0/0", "0.0.0.0/0 tcp:22 and tcp 3389",
+    "require MFA", "Duo Push", "block legacy authentication", "badge-only", "badge only",
+    "biometric", "restricted", "access control", "Visitor Log", "time in", "time out",
+    '"Action": "s3:Get*"', '"Action": "*", "Resource": "*"', "Action s3:List*",
+    "héllo", "wörld", " ", "\n", "\t", "unrelated text",
+]
+
+
+def _texts():
+    rng = random.Random(0)
+    texts = ["", "   ", "no evidence here"] + PHRASES
+    texts += [" ".join(rng.choice(PHRASES) for _ in range(rng.randint(1, 12))) for _ in range(400)]
+    return texts
+
+
+TEXTS = _texts()
+
+
+def _expected(text: str) -> dict:
+    """The original evaluate(): every pattern searched separately, hits then fails in rule order."""
+    t = re.sub(r"\s+", " ", text).lower()
+    out = {}
+    for ctrl, pats in app.CONTROLS.items():
+        hits = [p for p in pats if re.search(p, t)]
+        fails = [p for p in app.FAIL_PATTERNS.get(ctrl, []) if re.search(p, t)]
+        status = "NON_COMPLIANT" if fails else ("COMPLIANT" if hits else "INSUFFICIENT_EVIDENCE")
+        out[ctrl] = {"status": status, "matches": tuple(hits + fails)}
+    return out
+
+
+def _per_text(matcher):
+    return [app._results_from_matches(matcher(app.normalize(t))) for t in TEXTS]
+
+
+def test_hyperscan_matches_baseline():
+    pytest.importorskip("hyperscan")
+    assert app._HS_DB is not None
+    assert _per_text(lambda s: app._hs_matches(s.encode())) == [_expected(t) for t in TEXTS]
+
+
+@pytest.fixture
+def fresh_fallback():
+    """Rebuild the cached fallback matchers around the test."""
+    app._fallback_matchers.cache_clear()
+    yield
+    app._fallback_matchers.cache_clear()
+
+
+def test_aho_corasick_and_regex_match_baseline(fresh_fallback):
+    pytest.importorskip("ahocorasick")
+    assert app._fallback_matchers()[0] is not None
+    assert _per_text(app._fallback_matches) == [_expected(t) for t in TEXTS]
+
+
+def test_regex_only_matches_baseline(fresh_fallback, monkeypatch):
+    monkeypatch.setattr(app, "_build_literal_automaton", lambda: None)
+    assert app._fallback_matchers()[0] is None
+    assert _per_text(app._fallback_matches) == [_expected(t) for t in TEXTS]
+
+
+def test_pyarrow_matches_baseline():
+    pytest.importorskip("pyarrow")
+    matched = app._arrow_matches([app.normalize(t) for t in TEXTS])
+    assert [app._results_from_matches(m) for m in matched] == [_expected(t) for t in TEXTS]
+
+
+def test_evaluate_batch_matches_evaluate():
+    assert app.evaluate_batch(TEXTS) == [app.evaluate(t) for t in TEXTS]
+
+
+def _results_df():
+    names = [f"evidence_{i}.txt" for i in range(len(PHRASES))] + ["=formula-looking name.txt"]
+    texts = PHRASES + [" ".join(PHRASES)]
+    return app.results_to_dataframe(dict(zip(names, (app.evaluate(t) for t in texts))))
+
+
+def test_xlsx_round_trips_every_cell():
+    # constant_memory drops cells written to an already-flushed row, which is what
+    # df.to_excel (column-by-column) would do; every cell must survive the round trip.
+    pd = pytest.importorskip("pandas")
+    pytest.importorskip("xlsxwriter")
+    pytest.importorskip("openpyxl")
+    df = _results_df()
+    back = pd.read_excel(app.BytesIO(app.results_to_xlsx(df)), dtype=str, keep_default_na=False)
+    assert list(back.columns) == list(df.columns)
+    assert back.values.tolist() == df.astype(str).values.tolist()
+
+
+def test_csv_export_round_trips():
+    pd = pytest.importorskip("pandas")
+    df = _results_df()
+    back = pd.read_csv(app.BytesIO(app.export_results(df, "csv")), dtype=str, keep_default_na=False)
+    assert list(back.columns) == list(df.columns)
+    assert back.values.tolist() == df.astype(str).values.tolist()
+
+
+def test_parquet_export_round_trips():
+    pd = pytest.importorskip("pandas")
+    pytest.importorskip("pyarrow")
+    df = _results_df()
+    pd.testing.assert_frame_equal(pd.read_parquet(app.BytesIO(app.export_results(df, "parquet"))), df)